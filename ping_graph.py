@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+import array
+import asyncio
+import functools
 import subprocess
 import re
 import time as tme
@@ -9,96 +12,525 @@ import argparse
 import threading
 import numpy as np
 import socket
+import struct
+import os
+import shutil
 import sys
 
-def ping(host, times, pings, timeout, dead_timeout, interval):
-    ping_count = 0
-    global running
-    while running:
-        # Run the ping command with a timeout
-        command = ["timeout", str(dead_timeout / 1000), "ping6" if args.ipv6 else "ping", host, "-c", "1", "-W", str(timeout)]
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, error = process.communicate()
-
-        ping_count += 1
-        # Ping returns successfully
-        if process.returncode == 0:
-            # Extract the time from the output
-            match = re.search(r"time=(\d+.\d+) ms", out.decode('utf-8'))
-            if match:
-                delay = float(match.group(1))
-                # Check if the delay exceeds the timeout
-                if delay > timeout:
-                    print(f"Ping response time {delay} ms exceeded timeout of {timeout} ms")
-                    # don't Treat LONG delay as timeout
-                    times.append(delay)
-                    pings.append(ping_count)
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+# Same payload size as the ping utility
+ICMP_PAYLOAD = bytes(56)
+ICMP_HEADER = struct.Struct("!BBHHH")
+ICMP_CHECKSUM = struct.Struct("=H")
+# Linux raw socket filters, drop everything but echo replies in the kernel
+SOL_RAW = 255
+ICMP_FILTER = 1
+ICMP6_FILTER = 1
+# Number of samples kept for the graph, ~2.7 hours at the default interval
+HISTORY_SIZE = 100000
+# Longest plot refresh period in seconds when samples arrive slowly
+MAX_REDRAW_INTERVAL = 1.0
+# Line colors of the pinged hosts, red and magenta mark timeouts and losses
+LINE_COLORS = ['green', 'tab:blue', 'tab:orange', 'tab:purple', 'tab:brown', 'tab:olive', 'tab:cyan', 'tab:gray']
+
+# Maximum number of ping commands running at the same time
+MAX_COMMAND_PROBES = 50
+# RTT in the ping command output, e.g. "time=12.3 ms" or "time<1 ms"
+TIME_RE = re.compile(rb"time[=<]\s*(\d+(?:\.\d+)?)")
+SEQ_RE = re.compile(rb"icmp_seq=(\d+)")
+# ping -O reports every probe, so a new icmp_seq is never far past the last one seen
+MAX_SEQ_AHEAD = 100
+# Bytes of the streaming ping's stderr kept for its exit message
+MAX_ERROR_TAIL = 4096
+
+def icmp_checksum(data):
+    # One's complement sum can be done in host byte order (RFC 1071),
+    # the result is then stored in host byte order as well
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+    total = sum(array.array('H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def open_icmp_socket(use_ipv6):
+    family = socket.AF_INET6 if use_ipv6 else socket.AF_INET
+    proto = socket.IPPROTO_ICMPV6 if use_ipv6 else socket.IPPROTO_ICMP
+    # Try unprivileged ping socket first (net.ipv4.ping_group_range),
+    # then raw socket (root or CAP_NET_RAW)
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(family, sock_type, proto)
+        except OSError:
+            continue
+        if sock_type == socket.SOCK_RAW and sys.platform.startswith('linux'):
+            # A raw socket sees all ICMP traffic of the host, don't wake up for it
+            try:
+                if use_ipv6:
+                    blocked = [0xffffffff] * 8
+                    blocked[ICMPV6_ECHO_REPLY >> 5] &= ~(1 << (ICMPV6_ECHO_REPLY & 31))
+                    sock.setsockopt(socket.IPPROTO_ICMPV6, ICMP6_FILTER, struct.pack("8I", *blocked))
                 else:
-                    times.append(delay)
-                    pings.append(ping_count)
-        elif process.returncode == 124:
-            # Ping didn't return in reasonable time
-            # 124 is the exit code for timeout command if it reaches the timeout
-            print(f"Ping to {host} execution timed out after {dead_timeout} milliseconds")
-            times.append(dead_timeout)
-            pings.append(ping_count)
+                    sock.setsockopt(SOL_RAW, ICMP_FILTER, struct.pack("I", ~(1 << ICMP_ECHO_REPLY) & 0xffffffff))
+            except OSError:
+                pass
+        return sock
+    return None
+
+def icmp_echo_request(packet, ident, seq, use_ipv6):
+    # Fills in the header of a reusable packet buffer, the payload stays as it is
+    request_type = ICMPV6_ECHO_REQUEST if use_ipv6 else ICMP_ECHO_REQUEST
+    ICMP_HEADER.pack_into(packet, 0, request_type, 0, 0, ident, seq)
+    ICMP_CHECKSUM.pack_into(packet, 2, icmp_checksum(packet))
+
+def icmp_reply_seq(sock, data, ident, use_ipv6):
+    # Returns the sequence number of an echo reply to our requests, None for any other packet
+    # Raw IPv4 sockets deliver the IP header as well, so do ping sockets on macOS.
+    # No ICMP type starts with the IPv4 version nibble
+    if not use_ipv6 and data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < 8:
+        return None
+    icmp_type, _, _, reply_ident, reply_seq = ICMP_HEADER.unpack_from(data)
+    if icmp_type != (ICMPV6_ECHO_REPLY if use_ipv6 else ICMP_ECHO_REPLY):
+        return None
+    # Ping sockets (SOCK_DGRAM) rewrite the identifier and filter replies in the kernel
+    if sock.type == socket.SOCK_RAW and reply_ident != ident:
+        return None
+    return reply_seq
+
+def parse_ping_time(out):
+    # Fast path for the usual "time=12.3 ms" / "time<1 ms" without the regex engine
+    i = out.find(b"time=")
+    if i < 0:
+        i = out.find(b"time<")
+    if i < 0:
+        return None
+    j = out.find(b"ms", i + 5)
+    if j > 0:
+        try:
+            return float(out[i + 5:j])
+        except ValueError:
+            pass
+    # Unusual formatting, let the regex sort it out
+    match = TIME_RE.search(out, i)
+    return float(match.group(1)) if match else None
+
+@functools.lru_cache(maxsize=None)
+def ping_executable(use_ipv6):
+    # subprocess starts a program by absolute path with posix_spawn (vfork) instead of
+    # fork + exec, which would copy the page tables of the whole interpreter
+    name = "ping6" if use_ipv6 else "ping"
+    return shutil.which(name) or name
+
+async def ping_command(host, use_ipv6, timeout, dead_timeout):
+    command = [ping_executable(use_ipv6), host, "-n", "-c", "1", "-W", str(timeout)]
+    process = await asyncio.create_subprocess_exec(*command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=False)
+    # Kill the ping command ourselves if it runs longer than dead_timeout
+    try:
+        out, error = await asyncio.wait_for(process.communicate(), dead_timeout / 1000)
+        returncode = process.returncode
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            # It exited on its own just as the timeout hit
+            pass
+        await process.wait()
+        # Same exit code as the timeout command
+        returncode = 124
+
+    # Ping returns successfully
+    if returncode == 0:
+        # Extract the time from the output
+        delay = parse_ping_time(out)
+        if delay is None:
+            print(f"No response time in ping output for {host}")
+        return delay
+    elif returncode == 124:
+        # Ping didn't return in reasonable time
+        print(f"Ping to {host} execution timed out after {dead_timeout} milliseconds")
+    else:
+        # Ping didn't return in reasonable time
+        # Other reason, like Network Unreachable, etc ...
+        print(f"Failed to ping {host} or request timed out with error: {error.decode('utf-8', 'replace')}")
+    return None
+
+# Probe states in the history
+PENDING = 0
+ANSWERED = 1
+LOST = 2
+
+class RingBuffer:
+    # Fixed-capacity probe history, slot = ping number modulo capacity.
+    # The sender registers probes by advancing issued, replies and losses
+    # fill in their slots in any order, and write_pos then advances over the
+    # finished ones so the plot sees them in sending order. Each position has
+    # a single writer, so no lock is needed.
+    # Probes are stored as contiguous arrays (13 bytes per probe), which the
+    # plot consumes as slices without any conversion.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float32)
+        self.state = np.zeros(capacity, dtype=np.uint8)
+        self.sent = np.zeros(capacity, dtype=np.int64)
+        self.issued = 0
+        self.write_pos = 0
+        self.read_pos = 0
+
+    def start(self):
+        # Registers a new probe and returns its ping number (1-based)
+        i = self.issued % self.capacity
+        self.state[i] = PENDING
+        self.sent[i] = tme.perf_counter_ns()
+        self.issued += 1
+        return self.issued
+
+    def sent_at(self, ping_no):
+        return self.sent[(ping_no - 1) % self.capacity]
+
+    def in_flight(self, seq, ahead=0):
+        # Maps a 16-bit wire sequence number to the in-flight ping number, or to one
+        # at most ahead past the last issued probe. Probes that were already
+        # published (late or duplicate replies) map to None
+        ping_no = self.write_pos + 1 + ((seq - self.write_pos - 1) & 0xffff)
+        return ping_no if ping_no <= min(self.issued + ahead, self.write_pos + self.capacity) else None
+
+    def finish(self, ping_no, delay, state):
+        # Returns False if the probe was already answered or lost
+        i = (ping_no - 1) % self.capacity
+        if self.state[i] != PENDING:
+            return False
+        self.times[i] = delay
+        self.state[i] = state
+        return True
+
+    def publish(self):
+        # Yields finished probes in sending order and makes them visible to the plot;
+        # the oldest pending probe holds the rest back
+        while self.write_pos < self.issued:
+            i = self.write_pos % self.capacity
+            if self.state[i] == PENDING:
+                break
+            yield self.write_pos + 1, float(self.times[i]), self.state[i] == LOST
+            self.write_pos += 1
+
+    def snapshot(self):
+        # Returns ping numbers, times and states of the published probes
+        write_pos = self.write_pos
+        self.read_pos = write_pos
+        # In-flight probes reuse the oldest slots
+        first = max(0, self.issued - self.capacity)
+        if first == 0:
+            return np.arange(1, write_pos + 1), self.times[:write_pos], self.state[:write_pos]
+        index = np.arange(first, write_pos)
+        return index + 1, self.times.take(index, mode='wrap'), self.state.take(index, mode='wrap')
+
+class RunningStats:
+    # Statistics over the whole session, updated in O(1) per sample so the
+    # plot loop doesn't rescan the history.
+    # Mean and variance of answered pings use Welford's algorithm.
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.total = 0
+        self.greater_than_timeout = 0
+        self.timeouts = 0
+        self.lost = 0
+        self.sequence_timeout = 0
+        self.max_sequence_timeout = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = 0.0
+        self.max = 0.0
+        self.jitter_sum = 0.0
+        self.last = 0.0
+
+    def add(self, delay, lost):
+        self.total += 1
+        if delay > self.timeout:
+            self.greater_than_timeout += 1
+        # Lost pings count into the timeout sequence too (dead_timeout >= timeout)
+        if delay >= self.timeout:
+            self.sequence_timeout += 1
+            self.max_sequence_timeout = max(self.max_sequence_timeout, self.sequence_timeout)
         else:
-            # Ping didn't return in reasonable time
-            # Other reason, like Network Unreachable, etc ...
-            print(f"Failed to ping {host} or request timed out with error: {error.decode('utf-8')}")
-            # Mark lost ping as timeout value
-            times.append(dead_timeout)
-            pings.append(ping_count)
-
-        tme.sleep(interval)
-
-def update_stats(ax, times, timeout, dead_timeout, start_time):
-    if times:
-        total_running_time = tme.time() - start_time
-        valid_times = [time for time in times if time != dead_timeout]
-
-        if valid_times:
-            avg_time = np.mean(valid_times)
-            min_time = np.min(valid_times)
-            std_dev = np.std(valid_times)
-            # Calculate jitter as the average of the absolute differences between consecutive ping times
-            if len(valid_times) > 1:
-                jitter = np.mean([abs(valid_times[i] - valid_times[i - 1]) for i in range(1, len(valid_times))])
-            else:
-                jitter = 0
+            self.sequence_timeout = 0
+        if lost:
+            self.lost += 1
+            return
+        if delay >= self.timeout:
+            self.timeouts += 1
+
+        self.count += 1
+        if self.count == 1:
+            self.min = self.max = delay
         else:
-            avg_time = min_time = std_dev = jitter = 0
+            self.min = min(self.min, delay)
+            self.max = max(self.max, delay)
+            # Jitter is the average of the absolute differences between consecutive ping times
+            self.jitter_sum += abs(delay - self.last)
+        self.last = delay
+        delta = delay - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (delay - self.mean)
 
-        max_time = np.max(valid_times) if valid_times else 0
+    @property
+    def std_dev(self):
+        return (self.m2 / self.count) ** 0.5 if self.count else 0.0
 
-        # Calculate the percentage of times greater than timeout
-        times_greater_than_timeout = len([time for time in times if time > timeout])
-        percentage_greater_than_timeout = (times_greater_than_timeout / len(times)) * 100 if times else 0
+    @property
+    def jitter(self):
+        return self.jitter_sum / (self.count - 1) if self.count > 1 else 0.0
+
+class PingSession:
+    # Everything the ping thread works with, passed around explicitly
+    # instead of module globals, one per host. stop is shared by all hosts
+    # and set by the GUI thread on exit
+    __slots__ = ('host', 'use_ipv6', 'timeout', 'dead_timeout', 'interval', 'history', 'stats', 'stop')
+
+    def __init__(self, host, use_ipv6, timeout, dead_timeout, interval, history, stats, stop):
+        self.host = host
+        self.use_ipv6 = use_ipv6
+        self.timeout = timeout
+        self.dead_timeout = dead_timeout
+        self.interval = interval
+        self.history = history
+        self.stats = stats
+        self.stop = stop
+
+def publish_probes(session):
+    timeout = session.timeout
+    for ping_no, delay, lost in session.history.publish():
+        # Check if the delay exceeds the timeout
+        if delay > timeout and not lost:
+            print(f"Ping response time {delay:.2f} ms exceeded timeout of {timeout} ms")
+            # don't Treat LONG delay as timeout
+        session.stats.add(delay, lost)
+
+def expire_probes(session):
+    # Marks overdue probes as lost, returns seconds until the next one is due
+    history = session.history
+    dead_timeout = session.dead_timeout
+    now = tme.perf_counter_ns()
+    for ping_no in range(history.write_pos + 1, history.issued + 1):
+        age = (now - history.sent_at(ping_no)) / 1e6
+        if age < dead_timeout:
+            return (dead_timeout - age) / 1000
+        # Mark lost ping as timeout value
+        if history.finish(ping_no, dead_timeout, LOST):
+            print(f"Ping to {session.host} timed out after {dead_timeout} milliseconds")
+    return None
+
+def receive_replies(session, sock, ident):
+    # Reader callback, drains the replies that have arrived so far
+    history = session.history
+    while True:
+        try:
+            data, address = sock.recvfrom(2048)
+        except (BlockingIOError, InterruptedError):
+            break
+        received = tme.perf_counter_ns()
+        # Raw sockets of all pinged hosts see each other's replies
+        if address[0] != session.host:
+            continue
+        seq = icmp_reply_seq(sock, data, ident, session.use_ipv6)
+        ping_no = history.in_flight(seq) if seq is not None else None
+        if ping_no is not None:
+            history.finish(ping_no, (received - history.sent_at(ping_no)) / 1e6, ANSWERED)
+    publish_probes(session)
+
+async def expire_replies(session):
+    while not session.stop.is_set():
+        due = expire_probes(session)
+        publish_probes(session)
+        # Wake up when the oldest probe is due, and at least every 0.1 s to notice shutdown
+        await asyncio.sleep(0.1 if due is None else min(due, 0.1))
+
+async def wait_next_send(loop, next_send, interval):
+    # Sleeps on a fixed schedule, so the time spent sending doesn't add up to drift.
+    # After a stall the missed probes are skipped instead of sent in a burst
+    next_send += interval
+    now = loop.time()
+    if next_send < now:
+        next_send = now
+    await asyncio.sleep(next_send - now)
+    return next_send
 
+async def ping_socket(session, sock):
+    # Sending, receiving and expiring probes all run on one event loop
+    loop = asyncio.get_running_loop()
+    history = session.history
+    ident = os.getpid() & 0xffff
+    sock.setblocking(False)
+    loop.add_reader(sock.fileno(), receive_replies, session, sock, ident)
+    expiry = asyncio.create_task(expire_replies(session))
+
+    packet = bytearray(ICMP_HEADER.size) + ICMP_PAYLOAD
+    next_send = loop.time()
+    while not session.stop.is_set():
+        ping_no = history.start()
+        icmp_echo_request(packet, ident, ping_no & 0xffff, session.use_ipv6)
+        try:
+            sock.sendto(packet, (session.host, 0))
+        except OSError as e:
+            # Network Unreachable, etc ...
+            print(f"Failed to ping {session.host} with error: {e}")
+            history.finish(ping_no, session.dead_timeout, LOST)
+        # Don't wait for the reply, several probes can be in flight
+        next_send = await wait_next_send(loop, next_send, session.interval)
+
+    loop.remove_reader(sock.fileno())
+    await expiry
+
+async def probe_command(session, ping_no, semaphore):
+    try:
+        delay = await ping_command(session.host, session.use_ipv6, session.timeout, session.dead_timeout)
+    except Exception as e:
+        # Any failure still has to finish the probe, or it would hold back publishing for good
+        print(f"Failed to ping {session.host} with error: {e}")
+        delay = None
+    finally:
+        semaphore.release()
+    if delay is None:
+        # Mark lost ping as timeout value
+        session.history.finish(ping_no, session.dead_timeout, LOST)
+    else:
+        session.history.finish(ping_no, delay, ANSWERED)
+    publish_probes(session)
+
+async def ping_commands(session):
+    # Ping commands run concurrently, so a slow reply doesn't delay the next probe
+    probes = set()
+    semaphore = asyncio.Semaphore(MAX_COMMAND_PROBES)
+    loop = asyncio.get_running_loop()
+    next_send = loop.time()
+    while not session.stop.is_set():
+        # Wait for a free slot instead of queueing up processes
+        await semaphore.acquire()
+        task = asyncio.create_task(probe_command(session, session.history.start(), semaphore))
+        probes.add(task)
+        task.add_done_callback(probes.discard)
+        next_send = await wait_next_send(loop, next_send, session.interval)
+
+    if probes:
+        await asyncio.wait(probes)
+
+async def drain_errors(stream, tail):
+    # Keeps ping from blocking on a full stderr pipe, e.g. a sendmsg error per probe
+    # during an outage; only the last lines are kept for the exit message
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            break
+        tail[:] = (tail + chunk)[-MAX_ERROR_TAIL:]
+
+async def ping_stream(session):
+    # One long-running ping instead of a process per probe, -O (iputils) reports
+    # unanswered probes so they can be registered before they expire.
+    # Returns False if the ping command stopped on its own.
+    history = session.history
+    command = [ping_executable(session.use_ipv6), session.host, "-O", "-n", "-i", str(session.interval)]
+    process = await asyncio.create_subprocess_exec(*command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=False)
+    expiry = asyncio.create_task(expire_replies(session))
+    error = bytearray()
+    errors = asyncio.create_task(drain_errors(process.stderr, error))
+    try:
+        while not session.stop.is_set():
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), 0.1)
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                break
+            match = SEQ_RE.search(line)
+            if match is None:
+                continue
+            # icmp_seq wraps at 16 bits, like the socket path
+            ping_no = history.in_flight(int(match.group(1)) & 0xffff, MAX_SEQ_AHEAD)
+            if ping_no is None:
+                # Reply to a probe that was already published, e.g. after dead_timeout or (DUP!)
+                continue
+            while history.issued < ping_no:
+                history.start()
+            delay = parse_ping_time(line)
+            if delay is not None:
+                history.finish(ping_no, delay, ANSWERED)
+            elif b"no answer yet" not in line:
+                # Destination Host Unreachable, etc ...
+                history.finish(ping_no, session.dead_timeout, LOST)
+            publish_probes(session)
+    finally:
+        expiry.cancel()
+        if process.returncode is None:
+            process.terminate()
+            await process.wait()
+
+    if session.stop.is_set():
+        errors.cancel()
+        return True
+    await errors
+    print(f"Ping command for {session.host} exited with error: {error.decode('utf-8', 'replace').strip()}")
+    # Whatever is still pending won't be reported anymore
+    for ping_no in range(history.write_pos + 1, history.issued + 1):
+        history.finish(ping_no, session.dead_timeout, LOST)
+    publish_probes(session)
+    return False
+
+async def ping_fallback(session):
+    if not await ping_stream(session):
+        print("Falling back to one ping command per probe")
+        await ping_commands(session)
+
+async def ping_host(session):
+    # Send ICMP echo directly when possible, fall back to the ping command otherwise
+    sock = open_icmp_socket(session.use_ipv6)
+    if sock is not None:
+        try:
+            await ping_socket(session, sock)
+        finally:
+            sock.close()
+        return
+
+    print("ICMP socket is not available (needs root or net.ipv4.ping_group_range), using ping command")
+    await ping_fallback(session)
+
+async def ping_hosts(sessions):
+    # Before 3.12 asyncio reaps every child process from a new waitpid thread,
+    # a pidfd watcher does it from the event loop instead (Linux 5.3+)
+    if sys.version_info < (3, 12) and hasattr(os, 'pidfd_open'):
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+            watcher = asyncio.PidfdChildWatcher()
+            watcher.attach_loop(asyncio.get_running_loop())
+            asyncio.get_event_loop_policy().set_child_watcher(watcher)
+        except OSError:
+            pass
+    # All hosts are probed concurrently on the same event loop
+    await asyncio.gather(*(ping_host(session) for session in sessions))
+
+def ping(sessions):
+    asyncio.run(ping_hosts(sessions))
+
+def update_stats(stats_box, stats, timeout, dead_timeout, start_time):
+    if stats.total:
+        total_running_time = tme.monotonic() - start_time
+        avg_time = stats.mean
+        min_time = stats.min
+        max_time = stats.max
+        std_dev = stats.std_dev
+        jitter = stats.jitter
+
+        # Calculate the percentage of times greater than timeout
+        percentage_greater_than_timeout = (stats.greater_than_timeout / stats.total) * 100
         # Calculate the percentage of lost packets (where time == dead_timeout)
-        times_lost = len([time for time in times if time == dead_timeout])
-        percentage_lost = (times_lost / len(times)) * 100 if times else 0
-
-        # Calculate the maximum sequential number of times >= timeout
-        total = 0
-        total_timeout = 0
-        total_lost = 0
-        max_sequential_timeout = 0
-        current_sequence_timeout = 0
-        for time in times:
-            if time >= timeout and time != dead_timeout:
-                total_timeout += 1
-                current_sequence_timeout += 1
-            elif time == dead_timeout:
-                total_lost += 1
-                current_sequence_timeout += 1
-            else:
-                total += 1
-                current_sequence_timeout = 0
-
-            # Calculate the maximum sequential number of times >= timeout
-            if current_sequence_timeout > max_sequential_timeout:
-                max_sequential_timeout = current_sequence_timeout
+        percentage_lost = (stats.lost / stats.total) * 100
+        total_timeout = stats.timeouts
+        total_lost = stats.lost
+        max_sequential_timeout = stats.max_sequence_timeout
 
         stats_text = (
             f'Average: {avg_time:.2f} ms\n'
@@ -108,7 +540,7 @@ def update_stats(ax, times, timeout, dead_timeout, start_time):
             f'Jitter: {jitter:.2f} ms\n'
             f'% Timeout(>): {percentage_greater_than_timeout:.2f}%\n'
             f'% Lost(=): {percentage_lost:.2f}%\n'
-            f'total N:{len(times)}\n'
+            f'total N:{stats.total}\n'
             f'N timeout: {total_timeout}\n'
             f'Max N SEQ tim.: {max_sequential_timeout}\n'
             f'N lost: {total_lost}\n'
@@ -119,11 +551,109 @@ def update_stats(ax, times, timeout, dead_timeout, start_time):
             f'RunTime: {total_running_time:.2f} s\n\n'
             f'Press "q" to quit'
         )
-        ax.text(0.3, 0.95, stats_text, transform=ax.transAxes, fontsize=10, verticalalignment='top', horizontalalignment='right', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        stats_box.set_text(stats_text)
+
+def downsample(pings, times, width):
+    # Reduce the line to the min and max sample of each pixel column,
+    # which keeps spikes visible while drawing at most ~3 points per pixel
+    if width <= 0 or len(times) <= 2 * width:
+        return pings, times
+    size = len(times) // width
+    n = size * width
+    columns = times[:n].reshape(width, size)
+    offsets = np.arange(0, n, size)
+    keep = np.unique(np.concatenate((columns.argmin(axis=1) + offsets, columns.argmax(axis=1) + offsets, np.arange(n, len(times)))))
+    return pings[keep], times[keep]
+
+def update_plot(snapshots):
+    data_pings = []
+    data_times = []
+    for (pings, times, state), line, timeout_points, lost_points in zip(snapshots, lines, timeouts_points, losts_points):
+        if not len(pings):
+            continue
+        # The reduced line keeps the extremes, so it also gives the data limits
+        line_pings, line_times = downsample(pings, times, int(ax.bbox.width))
+        line.set_data(line_pings, line_times)
+        data_pings += [line_pings[0], line_pings[-1]]
+        data_times += [line_times.min(), line_times.max()]
+        lost = state == LOST
+        # Highlight timeouts in red
+        timed_out = (times >= timeout) & ~lost
+        timeout_points.set_offsets(np.column_stack((pings[timed_out], np.full(np.count_nonzero(timed_out), timeout))))
+        # Highlight dead timeouts in another color
+        lost_points.set_offsets(np.column_stack((pings[lost], np.full(np.count_nonzero(lost), dead_timeout))))
+    if not data_pings:
+        return
+
+    # Rescale only when the new data doesn't fit the current view,
+    # otherwise just blit the changed artists over the cached background
+    x_min, x_max = ax.get_xlim()
+    y_min, y_max = ax.get_ylim()
+    if (fig.canvas.supports_blit and background is None) or min(data_pings) < x_min or max(data_pings) > x_max or min(data_times) < y_min or max(data_times) > y_max:
+        # relim only looks at the reduced lines, not the whole history
+        ax.relim()
+        ax.autoscale_view()
+        # Leave room for the next pings so they can be blitted
+        x_min, x_max = ax.get_xlim()
+        ax.set_xlim(x_min, x_max + (x_max - x_min) * 0.25, auto=None)
+        # Coalesced with any pending resize or scale change, on_draw then refreshes the background
+        fig.canvas.draw_idle()
+    elif fig.canvas.supports_blit:
+        fig.canvas.restore_region(background)
+        draw_animated()
+        fig.canvas.blit(ax.bbox)
+    else:
+        fig.canvas.draw_idle()
+
+def draw_animated():
+    for artist in lines + timeouts_points + losts_points + [stats_box]:
+        ax.draw_artist(artist)
+
+def on_draw(event):
+    # Every full redraw (resize, rescale, Y scale toggle) refreshes the blitting background
+    global background
+    if fig.canvas.supports_blit:
+        background = fig.canvas.copy_from_bbox(ax.bbox)
+        draw_animated()
+
+def redraw():
+    global last_redraw
+    now = tme.monotonic()
+    new_samples = max(session.history.write_pos - session.history.read_pos for session in sessions)
+    # Follow the rate samples actually arrive at: about one frame per new
+    # sample, but no faster than --redraw-hz
+    if new_samples:
+        period = (now - last_redraw) / new_samples
+    else:
+        period = max_redraw_interval
+    timer.interval = int(min(max(period, min_redraw_interval), max_redraw_interval) * 1000)
+    last_redraw = now
+
+    # Skip the frame when the ping thread published nothing new
+    if new_samples:
+        show_stats()
+        update_plot([session.history.snapshot() for session in sessions])
+
+def show_stats():
+    update_stats(stats_box, sessions[stats_host].stats, timeout, dead_timeout, start_time)
+
+def mark_stats_host():
+    # With several hosts the stats box shows one of them, framed in its line color
+    # and with its name in bold in the legend, so long host names don't widen the box
+    stats_box.get_bbox_patch().set_edgecolor(lines[stats_host].get_color())
+    for i, text in enumerate(ax.get_legend().get_texts()):
+        text.set_fontweight('bold' if i == stats_host else 'normal')
+
+def next_stats_host(event):
+    global stats_host
+    stats_host = (stats_host + 1) % len(hosts)
+    mark_stats_host()
+    show_stats()
+    fig.canvas.draw_idle()
 
 def on_close(event):
-    global running
-    running = False
+    stop.set()
+    timer.stop()
     print('Close event')
 
 def resolve_hostname(host, use_ipv6):
@@ -141,74 +671,97 @@ def toggle_scale(event):
     plt.draw()
 
 if __name__ == "__main__":
-    running = True
     current_scale = 'linear'
-    parser = argparse.ArgumentParser(description='Ping a host and plot response time.', formatter_class=argparse.RawTextHelpFormatter)
-    parser.add_argument('host', type=str, help='The host to ping')
+    parser = argparse.ArgumentParser(description='Ping one or more hosts and plot response time.', formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('host', type=str, nargs='+', help='The host(s) to ping')
     parser.add_argument('-W', '--timeout', type=int, default=150, help='Timeout in milliseconds for each ping request')
     parser.add_argument('-i', '--interval', type=float, default=0.1, help='Interval between pings in seconds. Default is 0.1 second.')
     parser.add_argument('-D', '--dead_timeout', type=float, default=500, help='Execution timeout in milliseconds for each ping command.\nDefault is 500 milliseconds.\nMaximum is 10,000 milliseconds.\nMust be more or equal to timeout')
     parser.add_argument('-6', '--ipv6', action='store_true', help='Use IPv6 for the ping')
+    parser.add_argument('--history', type=int, default=HISTORY_SIZE, help=f'Number of most recent pings kept for the graph.\nDefault is {HISTORY_SIZE}.')
+    parser.add_argument('--redraw-hz', type=float, default=1.0, help='Maximum graph refresh rate in redraws per second.\nDefault is 1.')
 
     args = parser.parse_args()
 
-    host = args.host
+    hosts = args.host
     timeout = args.timeout
     interval = args.interval
     dead_timeout = args.dead_timeout
     if dead_timeout > 10000 or dead_timeout < timeout:
         sys.exit(f"Dead timeout (-D) value {dead_timeout} out of range. Exiting.")
+    # Probes are sent without waiting for replies, so they have to be spaced out
+    if interval <= 0:
+        sys.exit(f"Interval (-i) value {interval} must be positive. Exiting.")
+    # Probes still in flight occupy history slots too
+    if args.history < 1 or args.history <= dead_timeout / (interval * 1000) + 1:
+        sys.exit(f"History size (--history) value {args.history} is too small for {dead_timeout} ms dead timeout at {interval} s interval. Exiting.")
+    if args.redraw_hz <= 0:
+        sys.exit(f"Redraw rate (--redraw-hz) value {args.redraw_hz} must be positive. Exiting.")
+    # Probing runs at its own pace, the graph is redrawn at most redraw_hz times per second
+    min_redraw_interval = 1 / args.redraw_hz
+    max_redraw_interval = max(MAX_REDRAW_INTERVAL, min_redraw_interval)
 
-    resolved_host = resolve_hostname(host, args.ipv6)
-    if not resolved_host:
-        sys.exit(f"Could not resolve host {host}. Exiting.")
-
-    times = []
-    pings = []
-    start_time = tme.time()
+    stop = threading.Event()
+    sessions = []
+    for host in hosts:
+        resolved_host = resolve_hostname(host, args.ipv6)
+        if not resolved_host:
+            sys.exit(f"Could not resolve host {host}. Exiting.")
+        sessions.append(PingSession(resolved_host, args.ipv6, timeout, dead_timeout, interval, RingBuffer(args.history), RunningStats(timeout), stop))
+    start_time = tme.monotonic()
 
     # Start the ping thread
-    ping_thread = threading.Thread(target=ping, args=(resolved_host, times, pings, timeout, dead_timeout, interval))
+    ping_thread = threading.Thread(target=ping, args=(sessions,))
     ping_thread.start()
 
-    plt.ion()
     fig, ax = plt.subplots()
 
     fig.canvas.mpl_connect('close_event', on_close)
+    fig.canvas.mpl_connect('draw_event', on_draw)
 
     # Create a button to toggle the Y scale
     ax_button = plt.axes([0.05, 0.01, 0.07, 0.075])
     btn = Button(ax_button, 'Log. Y')
     btn.on_clicked(toggle_scale)
+    # and one to switch the stats box between hosts
+    stats_host = 0
+    if len(hosts) > 1:
+        ax_host_button = plt.axes([0.13, 0.01, 0.1, 0.075])
+        host_btn = Button(ax_host_button, 'Next host')
+        host_btn.on_clicked(next_stats_host)
 
-    while running:
-        if pings:
-            ax.clear()
-            ax.plot(pings, times, color='green')
-            # Highlight timeouts in red
-            ax.scatter(
-                [p for p, t in zip(pings, times) if t >= timeout and t != dead_timeout],
-                [timeout] * len([t for t in times if t >= timeout and t != dead_timeout]),
-                color='red'
-            )
-
-            # Highlight dead timeouts in another color
-            ax.scatter(
-                [p for p, t in zip(pings, times) if t == dead_timeout],
-                [dead_timeout] * len([t for t in times if t == dead_timeout]),
-                color='magenta'
-            )
-            ax.set_yscale(current_scale)
-            ax.set_title(f"Ping response times to {'IPv6 ' if args.ipv6 else 'IPv4 '}{host}")
-            ax.set_xlabel('Number of Pings')
-            ax.set_ylabel('Response Time (ms)')
-            ax.relim()
-            ax.autoscale_view()
-
-            update_stats(ax, times, timeout, dead_timeout, start_time)
-
-        plt.pause(1)
+    # Artists are created once and updated in place, animated ones are
+    # left out of full redraws and blitted on top of the cached background.
+    # Canvases that can't blit draw them with everything else
+    background = None
+    animated = fig.canvas.supports_blit
+    lines = []
+    timeouts_points = []
+    losts_points = []
+    for i, host in enumerate(hosts):
+        line, = ax.plot([], [], color=LINE_COLORS[i % len(LINE_COLORS)], label=host, animated=animated)
+        lines.append(line)
+        timeouts_points.append(ax.scatter([], [], color='red', animated=animated))
+        losts_points.append(ax.scatter([], [], color='magenta', animated=animated))
+    # The stats box stays inside the axes, blitting only restores and updates that area
+    stats_box = ax.text(0.02, 0.95, '', transform=ax.transAxes, fontsize=10, verticalalignment='top', horizontalalignment='left', multialignment='right', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5), clip_on=True, animated=animated)
+    if len(hosts) > 1:
+        ax.legend(loc='upper right')
+        mark_stats_host()
+    ax.set_yscale(current_scale)
+    ax.set_title(f"Ping response times to {'IPv6 ' if args.ipv6 else 'IPv4 '}{', '.join(hosts)}")
+    ax.set_xlabel('Number of Pings')
+    ax.set_ylabel('Response Time (ms)')
+
+    # Redraw from a GUI timer instead of polling in a loop
+    last_redraw = tme.monotonic()
+    timer = fig.canvas.new_timer(interval=int(max_redraw_interval * 1000))
+    timer.add_callback(redraw)
+    timer.start()
+    try:
+        plt.show()
+    finally:
+        stop.set()
     print('Exiting ...')
     ping_thread.join(2)
     print('Waiting last ping finishes ...')
-